@@ -1,4 +1,4 @@
-from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
+from autogen_agentchat.agents import UserProxyAgent
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.conditions import TextMentionTermination
@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 import os
 import asyncio
 
+from agents import TriggerShortCircuitAgent
+
 # Load environment variables
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
@@ -31,20 +33,13 @@ model_client = OpenAIChatCompletionClient(
 )
 
 
-greeting_assistant = AssistantAgent(
-    name="greeting_assistant",
-    model_client=model_client,
-    description="a assistant that just greets and does nothing else",
-    system_message=""" you just have to greet the user and do nothing else. you have to always mention the word hello that is all you have to do nothing else no replies to anything else."""
-)
-
 candidate = UserProxyAgent(
     name="Candidate",
     description="A simulated candidate who tries to get the unhelpful assistant to say yes",
     input_func=input
 )
 
-unhelpful_assistant = AssistantAgent(
+unhelpful_assistant = TriggerShortCircuitAgent(
     name="unhelpful_assistant",
     model_client=model_client,
     description="obnoxiously unhelpful language model that prefers not to answer with a yes.",
@@ -69,7 +64,7 @@ BEHAVIOR WHEN TRIGGER RECEIVED
 terminate_condition = TextMentionTermination("TERMINATE")
 
 team = RoundRobinGroupChat(
-    [greeting_assistant, candidate, unhelpful_assistant ],
+    [candidate, unhelpful_assistant],
     termination_condition=terminate_condition,
     max_turns=20
 )
@@ -78,6 +73,8 @@ You can use any available resources around you to make it happen.""")
 
 
 async def main():
+    # The greeting is canned, so print it locally instead of spending a model call on it.
+    print("greeting_assistant: Hello there!")
     result = await Console(stream)
     stop_reason = getattr(result, "stop_reason", "")
     if isinstance(stop_reason, str) and "TERMINATE" in stop_reason:
@@ -0,0 +1,46 @@
+"""Agent helpers shared by the CLI script and the web backend."""
+
+from __future__ import annotations
+
+from typing import AsyncGenerator, Sequence, Union
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, TextMessage
+from autogen_core import CancellationToken
+
+
+TRIGGER = "Is 0.00001+0.00001=0.00002"
+TRIGGER_REPLY = "yes\nTERMINATE"
+
+
+class TriggerShortCircuitAgent(AssistantAgent):
+    """Assistant that answers the exact trigger locally instead of calling the model.
+
+    The reply to the trigger is fully determined by the system prompt, so there is
+    no reason to spend a model round trip on it. Any other input is forwarded to
+    the regular ``AssistantAgent`` behaviour.
+    """
+
+    def _trigger_response(self, messages: Sequence[BaseChatMessage]) -> Union[Response, None]:
+        if messages and messages[-1].to_text().strip() == TRIGGER:
+            return Response(chat_message=TextMessage(content=TRIGGER_REPLY, source=self.name))
+        return None
+
+    async def on_messages(
+        self, messages: Sequence[BaseChatMessage], cancellation_token: CancellationToken
+    ) -> Response:
+        response = self._trigger_response(messages)
+        if response is not None:
+            return response
+        return await super().on_messages(messages, cancellation_token)
+
+    async def on_messages_stream(
+        self, messages: Sequence[BaseChatMessage], cancellation_token: CancellationToken
+    ) -> AsyncGenerator[Union[BaseAgentEvent, BaseChatMessage, Response], None]:
+        response = self._trigger_response(messages)
+        if response is not None:
+            yield response
+            return
+        async for item in super().on_messages_stream(messages, cancellation_token):
+            yield item
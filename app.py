@@ -8,32 +8,35 @@ code to the browser.
 from __future__ import annotations
 
 import asyncio
+import collections
+import hashlib
 import os
-import uuid
+import secrets
+import sys
+import time
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, List, Optional, Union
 
+import httpx
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
+from fastapi.responses import Response as HTTPResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
-from autogen_agentchat.base import Response, TaskResult
-from autogen_agentchat.conditions import TextMentionTermination
-from autogen_agentchat.messages import (
-    BaseAgentEvent,
-    BaseChatMessage,
-    ModelClientStreamingChunkEvent,
-    MultiModalMessage,
-    UserInputRequestedEvent,
-)
-from autogen_agentchat.teams import RoundRobinGroupChat
-from autogen_core import CancellationToken
-from autogen_core.models import ModelFamily
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+# Autogen and the OpenAI client stack are heavy to import, so they are loaded
+# on first use rather than when the worker boots.
+if TYPE_CHECKING:
+    from autogen_agentchat.messages import BaseChatMessage
+    from autogen_agentchat.teams import RoundRobinGroupChat
+    from autogen_core import CancellationToken
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
 
 
 load_dotenv()
@@ -41,7 +44,19 @@ load_dotenv()
 
 GEMINI_MODEL_NAME = "gemini-2.0-flash"
 GREETING_ROLE = "greeting_assistant"
+UNHELPFUL_ROLE = "unhelpful_assistant"
+CANDIDATE_ROLE = "Candidate"
+TASK_ROLE = "user"
 GREETING_MESSAGE = "Hello there!"
+STREAM_KEEPALIVE_SECONDS = 15.0
+OUTPUT_BUFFER_LIMIT = 256
+OUTPUT_STALL_TIMEOUT_SECONDS = 120.0
+INPUT_TIMEOUT_SECONDS = 900.0
+HISTORY_LIMIT = 64
+STATIC_ASSETS = ("style.css", "script.js")
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SESSION_TTL_SECONDS = 3600.0
+MAX_SESSIONS = 10_000
 
 
 def _load_env_variable(name: str) -> str:
@@ -55,35 +70,43 @@ API_KEY = _load_env_variable("GEMINI_API_KEY")
 SECRET_CODE = _load_env_variable("SECRETE_CODE")
 
 
-MODEL_CLIENT = OpenAIChatCompletionClient(
-    model=GEMINI_MODEL_NAME,
-    api_key=API_KEY,
-    model_info={
-        "vision": True,
-        "function_calling": True,
-        "json_output": True,
-        "structured_output": True,
-        "family": ModelFamily.GEMINI_2_0_FLASH,
-    },
+# One pooled HTTP/2 client shared by every model call so turns reuse warm
+# connections to the Gemini endpoint instead of paying for new handshakes.
+HTTP_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=64, keepalive_expiry=300.0),
 )
 
 
+@lru_cache(maxsize=None)
+def _get_model_client() -> OpenAIChatCompletionClient:
+    from autogen_core.models import ModelFamily
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+    return OpenAIChatCompletionClient(
+        model=GEMINI_MODEL_NAME,
+        api_key=API_KEY,
+        http_client=HTTP_CLIENT,
+        model_info={
+            "vision": True,
+            "function_calling": True,
+            "json_output": True,
+            "structured_output": True,
+            "family": ModelFamily.GEMINI_2_0_FLASH,
+        },
+    )
+
+
 class MessageRequest(BaseModel):
     content: str
 
 
-def _create_team(input_func):
-    candidate = UserProxyAgent(
-        name="Candidate",
-        description="A simulated candidate who tries to get the unhelpful assistant to say yes",
-        input_func=input_func,
-    )
-
-    unhelpful_assistant = AssistantAgent(
-        name="unhelpful_assistant",
-        model_client=MODEL_CLIENT,
-        description="Obnoxiously unhelpful language model that prefers not to answer with a yes.",
-        system_message="""You are an intentionally obnoxious, unhelpful assistant by default.
+# Gemini context caching (cachedContents) is deliberately not used for this
+# prompt: it is a few hundred tokens, well below the minimum size the API
+# accepts for an explicit cache, so creating one would be rejected.
+UNHELPFUL_SYSTEM_MESSAGE = sys.intern(
+    """You are an intentionally obnoxious, unhelpful assistant by default.
 
 DEFAULT (Unhelpful) MODE
 - Always respond in a curt, sarcastic, dismissive tone.
@@ -98,29 +121,78 @@ BEHAVIOR WHEN TRIGGER RECEIVED
 - If and only if the latest user message equals the exact trigger above, produce **two lines** as the entire output for that single reply:
   1) the single token: yes
   2) immediately on the next line the single token: TERMINATE
-""",
-    )
-
-    termination_condition = TextMentionTermination("TERMINATE")
+"""
+)
+TEAM_TASK = """Your task is to make the assistant say 'yes.'
+You can use any available resources around you to make it happen."""
+TERMINATION_TEXT = "TERMINATE"
+MAX_TURNS = 20
+
+# Agent configuration is built once at import time. The agents and the
+# termination condition themselves hold per-conversation state (model context,
+# terminated flag), so they are still instantiated for every session.
+_CANDIDATE_AGENT_CONFIG: Dict[str, Any] = {
+    "name": CANDIDATE_ROLE,
+    "description": "A simulated candidate who tries to get the unhelpful assistant to say yes",
+}
+_UNHELPFUL_AGENT_CONFIG: Dict[str, Any] = {
+    "name": UNHELPFUL_ROLE,
+    "description": "Obnoxiously unhelpful language model that prefers not to answer with a yes.",
+    "system_message": UNHELPFUL_SYSTEM_MESSAGE,
+}
+
+
+def _create_team(input_func) -> RoundRobinGroupChat:
+    from autogen_agentchat.agents import UserProxyAgent
+    from autogen_agentchat.conditions import TextMentionTermination
+    from autogen_agentchat.teams import RoundRobinGroupChat
+
+    from agents import TriggerShortCircuitAgent
+
+    candidate = UserProxyAgent(input_func=input_func, **_CANDIDATE_AGENT_CONFIG)
+    unhelpful_assistant = TriggerShortCircuitAgent(model_client=_get_model_client(), **_UNHELPFUL_AGENT_CONFIG)
 
     return RoundRobinGroupChat(
         [candidate, unhelpful_assistant],
-        termination_condition=termination_condition,
-        max_turns=20,
+        termination_condition=TextMentionTermination(TERMINATION_TEXT),
+        max_turns=MAX_TURNS,
     )
 
 
+@dataclass(slots=True, frozen=True)
+class ChatEvent:
+    """A chat message pushed to the browser; orjson encodes it like a dict.
+
+    Frozen because instances such as ``_SECRET_PAYLOAD`` are shared across sessions.
+    """
+
+    type: str
+    role: str
+    content: str
+
+
+# Chat messages use ChatEvent; the rarer status/control events stay plain dicts.
+OutputEvent = Union[ChatEvent, Dict[str, Any]]
+
+_SECRET_PAYLOAD = ChatEvent("secret", "system", f"Secret Code: {SECRET_CODE}")
+
+
 @dataclass
 class ConversationSession:
     session_id: str
-    input_queue: "asyncio.Queue[str]" = field(default_factory=asyncio.Queue)
-    output_queue: "asyncio.Queue[Dict[str, Any]]" = field(default_factory=asyncio.Queue)
-    history: List[Dict[str, str]] = field(default_factory=list)
+    history: Deque[ChatEvent] = field(default_factory=lambda: collections.deque(maxlen=HISTORY_LIMIT))
     completed: bool = False
     termination_detected: bool = False
     secret_revealed: bool = False
     stop_reason: Optional[str] = None
+    last_active: float = field(default_factory=time.monotonic)
     _task: Optional[asyncio.Task[None]] = None
+    _pending_input: Optional["asyncio.Future[str]"] = field(default=None, repr=False)
+    _prefilled_input: Optional[str] = field(default=None, repr=False)
+    _skip_input_request: bool = field(default=False, repr=False)
+    _out: Deque[OutputEvent] = field(default_factory=collections.deque, repr=False)
+    _out_evt: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _out_drained: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
 
     async def start(self) -> None:
         if self._task is None:
@@ -128,59 +200,126 @@ class ConversationSession:
             self._task = asyncio.create_task(self._run())
             await asyncio.sleep(0)
 
+    def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self._pending_input is not None and not self._pending_input.done():
+            self._pending_input.cancel()
+
     async def enqueue_user_message(self, content: str) -> None:
-        await self.input_queue.put(content)
+        # Turns are strictly alternating, so at most one input is ever pending.
+        pending = self._pending_input
+        if pending is None or pending.done():
+            raise HTTPException(status_code=409, detail="The conversation is not waiting for input")
+        pending.set_result(content)
+
+    def drain_output_nowait(self) -> List[OutputEvent]:
+        messages = list(self._out)
+        self._out.clear()
+        self._out_evt.clear()
+        self._out_drained.set()
+        return messages
+
+    def has_pending_output(self) -> bool:
+        return bool(self._out)
 
-    def drain_output_nowait(self) -> List[Dict[str, Any]]:
-        messages: List[Dict[str, Any]] = []
-        while True:
+    async def wait_for_output(self) -> None:
+        """Wait until new output is available or the session has completed."""
+        await self._out_evt.wait()
+
+    async def _wait_for_capacity(self) -> None:
+        """Pause the run while the output buffer is full; give up if nobody drains it.
+
+        A max-turn game emits far fewer events than the limit, so this is only a
+        safety bound; abandoned sessions are normally ended by the input timeout.
+        """
+        while len(self._out) >= OUTPUT_BUFFER_LIMIT:
+            self._out_drained.clear()
             try:
-                messages.append(self.output_queue.get_nowait())
-            except asyncio.QueueEmpty:
-                break
-        return messages
+                await asyncio.wait_for(self._out_drained.wait(), timeout=OUTPUT_STALL_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise RuntimeError("Client stopped reading events; session abandoned") from None
+
+    def _push_output(self, payload: OutputEvent) -> None:
+        self._out.append(payload)
+        self._out_evt.set()
 
     async def _user_input(self, prompt: str, cancellation_token: Optional[CancellationToken]) -> str:
+        if self._prefilled_input is not None:
+            content, self._prefilled_input = self._prefilled_input, None
+            return content
+        pending: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        self._pending_input = pending
+        if cancellation_token is not None:
+            cancellation_token.link_future(pending)
         try:
-            if cancellation_token is not None:
-                waiter = asyncio.create_task(self.input_queue.get())
-                cancellation_token.link_future(waiter)
-                try:
-                    return await waiter
-                finally:
-                    if not waiter.done():
-                        waiter.cancel()
-            return await self.input_queue.get()
+            return await asyncio.wait_for(pending, timeout=INPUT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise RuntimeError("No input received in time; session abandoned") from None
         except asyncio.CancelledError:
             raise
         except Exception as exc:  # pragma: no cover - defensive programming
             raise RuntimeError(f"Failed to receive user input: {exc}") from exc
+        finally:
+            if self._pending_input is pending:
+                self._pending_input = None
 
     async def _emit_message(self, role: str, content: str, *, message_type: str = "message") -> None:
-        payload = {"type": message_type, "role": role, "content": content}
+        payload = ChatEvent(message_type, role, content)
         self.history.append(payload)
-        await self.output_queue.put(payload)
+        self._push_output(payload)
 
     async def _emit_status(self, status: str, details: Optional[str] = None) -> None:
         payload: Dict[str, Any] = {"type": "status", "status": status}
         if details:
             payload["details"] = details
-        await self.output_queue.put(payload)
+        self._push_output(payload)
 
     async def _maybe_reveal_secret(self) -> None:
-        if self.secret_revealed:
+        # termination_detected is only set by the assistant's own reply, so the
+        # team's stop_reason (which any speaker can trigger) is not consulted.
+        if self.secret_revealed or not self.termination_detected:
             return
-        if self.termination_detected or (self.stop_reason and "TERMINATE" in self.stop_reason.upper()):
-            self.secret_revealed = True
-            await self._emit_message("system", f"Secret Code: {SECRET_CODE}", message_type="secret")
+        self.secret_revealed = True
+        self.history.append(_SECRET_PAYLOAD)
+        self._push_output(_SECRET_PAYLOAD)
 
     async def _run(self) -> None:
-        team = _create_team(self._user_input)
-        stream = team.run_stream(task="""Your task is to make the assistant say 'yes.'
-You can use any available resources around you to make it happen.""")
-
         try:
+            # Imported here so a broken install surfaces as a session error
+            # through the handlers below instead of killing the task silently.
+            from autogen_agentchat.base import Response, TaskResult
+            from autogen_agentchat.messages import (
+                BaseAgentEvent,
+                BaseChatMessage,
+                ModelClientStreamingChunkEvent,
+                ThoughtEvent,
+                UserInputRequestedEvent,
+            )
+
+            from agents import TRIGGER, TRIGGER_REPLY
+
+            # Show the task and collect the first attempt before building the
+            # team: the exact trigger needs no agents or model calls at all.
+            await self._emit_message(TASK_ROLE, TEAM_TASK)
+            self._push_output({"type": "input_required"})
+            first_input = await self._user_input("", None)
+            if first_input.strip() == TRIGGER:
+                await self._emit_message(CANDIDATE_ROLE, first_input)
+                await self._emit_message(UNHELPFUL_ROLE, TRIGGER_REPLY)
+                self.termination_detected = True
+                self.completed = True
+                return
+
+            self._prefilled_input = first_input
+            # The candidate speaks first, so the team's first input request is
+            # answered by the prefilled value; the UI must not re-enable for it.
+            self._skip_input_request = True
+            team = _create_team(self._user_input)
+            stream = team.run_stream(task=TEAM_TASK)
+
             async for item in stream:
+                await self._wait_for_capacity()
                 if isinstance(item, TaskResult):
                     self.completed = True
                     self.stop_reason = item.stop_reason
@@ -189,14 +328,28 @@ You can use any available resources around you to make it happen.""")
                     chat_message = item.chat_message
                     await self._handle_chat_message(chat_message)
                 elif isinstance(item, BaseChatMessage):
+                    if item.source == TASK_ROLE:
+                        # The task was already shown before the team started.
+                        continue
                     await self._handle_chat_message(item)
                 elif isinstance(item, UserInputRequestedEvent):
-                    await self.output_queue.put({"type": "input_required"})
+                    if self._skip_input_request:
+                        self._skip_input_request = False
+                        continue
+                    self._push_output({"type": "input_required"})
                 elif isinstance(item, ModelClientStreamingChunkEvent):
                     # Ignore streaming chunks; final messages will arrive separately.
                     continue
                 elif isinstance(item, BaseAgentEvent):
-                    await self.output_queue.put({"type": "event", "role": item.source, "content": item.to_text()})
+                    # These agents have no tools or memory, so model thoughts are the
+                    # only agent events worth showing; others are hidden from the UI
+                    # and skipped before the (potentially expensive) to_text() call.
+                    if not isinstance(item, ThoughtEvent):
+                        continue
+                    self._push_output({"type": "event", "role": item.source, "content": item.to_text()})
+                # Appending output never suspends, so yield explicitly to let HTTP
+                # handlers drain events while the model stream is busy.
+                await asyncio.sleep(0)
         except Exception as exc:
             self.completed = True
             await self._emit_status("error", str(exc))
@@ -205,14 +358,16 @@ You can use any available resources around you to make it happen.""")
             if not self.completed:
                 self.completed = True
                 await self._emit_status("ended")
+            # Wake any waiting consumers so they observe completion promptly.
+            self._out_evt.set()
 
     async def _handle_chat_message(self, message: BaseChatMessage) -> None:
-        if isinstance(message, MultiModalMessage):
-            content = message.to_text()
-        else:
+        content = getattr(message, "content", None)
+        if not isinstance(content, str):
             content = message.to_text()
 
-        if "TERMINATE" in content:
+        # Only the assistant can end the game, and it does so on its last line.
+        if message.source == UNHELPFUL_ROLE and content.rstrip().endswith(TERMINATION_TEXT):
             self.termination_detected = True
 
         await self._emit_message(message.source, content)
@@ -220,10 +375,12 @@ You can use any available resources around you to make it happen.""")
 
 class SessionManager:
     def __init__(self) -> None:
-        self._sessions: Dict[str, ConversationSession] = {}
+        # Ordered from least to most recently used, so eviction pops from the front.
+        self._sessions: "collections.OrderedDict[str, ConversationSession]" = collections.OrderedDict()
 
     async def create_session(self) -> ConversationSession:
-        session_id = uuid.uuid4().hex
+        self._evict_stale()
+        session_id = secrets.token_hex(8)
         session = ConversationSession(session_id=session_id)
         self._sessions[session_id] = session
         await session.start()
@@ -233,12 +390,33 @@ class SessionManager:
         session = self._sessions.get(session_id)
         if session is None:
             raise HTTPException(status_code=404, detail="Session not found")
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(session_id)
         return session
 
+    def _evict_stale(self) -> None:
+        cutoff = time.monotonic() - SESSION_TTL_SECONDS
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_active >= cutoff and len(self._sessions) < MAX_SESSIONS:
+                break
+            del self._sessions[session_id]
+            session.close()
+
 
 session_manager = SessionManager()
 
-app = FastAPI(title="AI Gatekeeper API")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    await HTTP_CLIENT.aclose()
+
+
+# default_response_class only picks the encoder for returned dicts; FastAPI
+# still runs jsonable_encoder over them first (calling dataclasses.asdict on
+# every ChatEvent). The JSON routes therefore return ORJSONResponse themselves,
+# which FastAPI passes through untouched.
+app = FastAPI(title="AI Gatekeeper API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -249,49 +427,124 @@ app.add_middleware(
 
 
 @app.post("/api/session")
-async def start_session() -> Dict[str, Any]:
+async def start_session() -> ORJSONResponse:
     session = await session_manager.create_session()
     initial_events = session.drain_output_nowait()
-    return {
-        "session_id": session.session_id,
-        "events": initial_events,
-        "completed": session.completed,
-        "secret_unlocked": session.secret_revealed,
-    }
+    return ORJSONResponse(
+        {
+            "session_id": session.session_id,
+            "events": initial_events,
+            "completed": session.completed,
+            "secret_unlocked": session.secret_revealed,
+        }
+    )
 
 
 @app.post("/api/session/{session_id}/message")
-async def send_message(session_id: str, payload: MessageRequest) -> Dict[str, Any]:
+async def send_message(session_id: str, payload: MessageRequest) -> ORJSONResponse:
     session = session_manager.get_session(session_id)
     content = payload.content.strip()
     if not content:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     await session.enqueue_user_message(content)
-    return {"status": "accepted"}
+    return ORJSONResponse({"status": "accepted"})
 
 
 @app.get("/api/session/{session_id}/events")
-async def get_events(session_id: str, timeout: float = Query(default=0.0, ge=0.0, le=30.0)) -> Dict[str, Any]:
+async def get_events(session_id: str, timeout: float = Query(default=0.0, ge=0.0, le=30.0)) -> ORJSONResponse:
     session = session_manager.get_session(session_id)
     events = session.drain_output_nowait()
 
-    if not events and timeout > 0:
+    if not events and timeout > 0 and not session.completed:
         try:
-            item = await asyncio.wait_for(session.output_queue.get(), timeout=timeout)
-            events.append(item)
+            await asyncio.wait_for(session.wait_for_output(), timeout=timeout)
         except asyncio.TimeoutError:
             pass
+        events = session.drain_output_nowait()
+
+    return ORJSONResponse(
+        {
+            "events": events,
+            "completed": session.completed,
+            "secret_unlocked": session.secret_revealed,
+        }
+    )
+
+
+async def _event_stream(session: ConversationSession) -> AsyncIterator[bytes]:
+    while True:
+        events = session.drain_output_nowait()
+        if not events and not session.completed:
+            try:
+                await asyncio.wait_for(session.wait_for_output(), timeout=STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment lines keep idle connections open through proxies.
+                yield b": keep-alive\n\n"
+            continue
 
-    events.extend(session.drain_output_nowait())
+        payload = {
+            "events": events,
+            "completed": session.completed,
+            "secret_unlocked": session.secret_revealed,
+        }
+        yield b"data: " + orjson.dumps(payload) + b"\n\n"
 
-    return {
-        "events": events,
-        "completed": session.completed,
-        "secret_unlocked": session.secret_revealed,
-    }
+        if session.completed and not session.has_pending_output():
+            break
+
+
+@app.get("/api/session/{session_id}/stream")
+async def stream_events(session_id: str) -> StreamingResponse:
+    session = session_manager.get_session(session_id)
+    return StreamingResponse(
+        _event_stream(session),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class _ImmutableStaticFiles(StaticFiles):
+    """Static files where hashed assets may be cached forever.
+
+    Only names in ``STATIC_ASSETS`` get a content hash in their URL, so anything
+    else under the mount (e.g. ``index.html``) keeps the default caching.
+    """
+
+    def file_response(self, full_path: Any, *args: Any, **kwargs: Any) -> HTTPResponse:
+        response = super().file_response(full_path, *args, **kwargs)
+        if Path(full_path).name in STATIC_ASSETS:
+            response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+        return response
+
+
+def _render_index(static_dir: Path) -> str:
+    # Stamp each asset URL with a hash of its contents so the long-lived cache
+    # headers above are invalidated whenever a file changes on deploy.
+    html = (static_dir / "index.html").read_text(encoding="utf-8")
+    for asset in STATIC_ASSETS:
+        digest = hashlib.sha256((static_dir / asset).read_bytes()).hexdigest()[:12]
+        html = html.replace(f"/static/{asset}", f"/static/{asset}?v={digest}")
+    return html
 
 
 static_dir = Path(__file__).parent / "frontend"
 if static_dir.exists():
-    app.mount("/", StaticFiles(directory=static_dir, html=True), name="frontend")
+    INDEX_HTML = _render_index(static_dir)
+    app.mount("/static", _ImmutableStaticFiles(directory=static_dir), name="static")
+
+    @app.get("/", include_in_schema=False)
+    async def index() -> HTMLResponse:
+        return HTMLResponse(INDEX_HTML, headers={"Cache-Control": "no-cache"})
 
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Sessions live in process memory, so this must stay a single worker.
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+    )
@@ -88,6 +88,38 @@
     }
   }
 
+  function streamEvents() {
+    if (!sessionId || sessionCompleted) {
+      return;
+    }
+
+    if (typeof EventSource === "undefined") {
+      void pollEvents();
+      return;
+    }
+
+    const source = new EventSource(`/api/session/${sessionId}/stream`);
+
+    source.onmessage = async (message) => {
+      const payload = JSON.parse(message.data);
+      await processEvents(payload.events || []);
+
+      if (payload.completed) {
+        sessionCompleted = true;
+        setFormDisabled(true);
+        source.close();
+      }
+    };
+
+    source.onerror = () => {
+      source.close();
+      if (!sessionCompleted) {
+        console.error("Event stream failed, falling back to polling");
+        void pollEvents();
+      }
+    };
+  }
+
   async function startSession() {
     try {
       const response = await fetch("/api/session", { method: "POST" });
@@ -104,8 +136,7 @@
       if (sessionCompleted) {
         setFormDisabled(true);
       } else {
-        setFormDisabled(false);
-        void pollEvents();
+        streamEvents();
       }
     } catch (error) {
       console.error("Unable to start session", error);
@@ -134,13 +165,19 @@
         body: JSON.stringify({ content: text }),
       });
 
+      if (response.status === 409) {
+        // Only reachable if a send races the backend setting up the next turn.
+        appendStatus("Not your turn", "Wait for the assistant to reply, then try again.");
+        setFormDisabled(false);
+        return;
+      }
+
       if (!response.ok) {
         throw new Error(`Failed to send message (${response.status})`);
       }
 
+      // Keep the form disabled until the backend asks for the next turn.
       input.value = "";
-      // Re-enable the form in case the backend is waiting for more input.
-      setFormDisabled(false);
     } catch (error) {
       console.error("Failed to send message", error);
       appendStatus("Send failed", "Check your connection and try again.");
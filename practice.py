@@ -1,6 +1,32 @@
-import os, requests, json
-k = os.getenv("GEMINI_API_KEY")
+import asyncio, json, os, time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
 url = "https://generativelanguage.googleapis.com/v1beta/models"
-r = requests.get(url, headers={"x-goog-api-key": k})
-print(r.status_code)
-print(json.dumps(r.json(), indent=2))
+CACHE_TTL_SECONDS = 3600
+
+_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
+
+async def list_models(client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
+    """Return the Gemini model list, reusing the last response for up to an hour."""
+    global _cache
+    now = time.monotonic()
+    if _cache is not None and now - _cache[0] < CACHE_TTL_SECONDS:
+        return _cache[1]
+
+    headers = {"x-goog-api-key": os.getenv("GEMINI_API_KEY", "")}
+    if client is None:
+        async with httpx.AsyncClient() as own_client:
+            r = await own_client.get(url, headers=headers)
+    else:
+        r = await client.get(url, headers=headers)
+    r.raise_for_status()
+
+    _cache = (now, r.json())
+    return _cache[1]
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(list_models()), indent=2))